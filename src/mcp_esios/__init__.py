@@ -1,7 +1,10 @@
 import asyncio
+import atexit
 import click
 import logging
+import logging.handlers
 import os
+import queue
 import sys
 from typing import Optional
 
@@ -17,11 +20,18 @@ def configure_logging(verbose: int) -> None:
     else:
         logging_level = logging.DEBUG
     
-    logging.basicConfig(
-        level=logging_level,
-        stream=sys.stderr,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
+    # Write to stderr from a background thread so a slow consumer cannot stall the event loop
+    stream_handler = logging.StreamHandler(sys.stderr)
+    stream_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, stream_handler)
+
+    root_logger = logging.getLogger()
+    root_logger.setLevel(logging_level)
+    root_logger.addHandler(logging.handlers.QueueHandler(log_queue))
+
+    listener.start()
+    atexit.register(listener.stop)
 
 def get_api_token() -> Optional[str]:
     """Get the ESIOS API token from environment variables."""
@@ -1,13 +1,95 @@
+import asyncio
+import contextlib
+import functools
 import logging
+import os
 import re
-from datetime import datetime
-from typing import List, Optional
+import tempfile
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
 
 import aiohttp
+import ijson
+import orjson
 from pydantic import BaseModel, Field
 
 logger = logging.getLogger(__name__)
 
+
+def _default_cache_path() -> Path:
+    """Returns the on-disk location of the indicators cache."""
+    cache_home = os.getenv("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return Path(cache_home) / "mcp-esios" / "indicators.json"
+
+
+# Characters that give a query regex meaning; queries without them are plain substrings
+_REGEX_METACHARACTERS = re.compile(r"[.^$*+?{}\[\]\\|()]")
+
+
+def _format_datetime(dt: datetime) -> str:
+    """Formats a datetime as the ISO8601 timestamp expected by the ESIOS API."""
+    return f"{dt.year:04d}-{dt.month:02d}-{dt.day:02d}T{dt.hour:02d}:{dt.minute:02d}:{dt.second:02d}Z"
+
+
+@functools.lru_cache(maxsize=256)
+def _compile(query: str) -> re.Pattern:
+    """Compiles a case-insensitive search pattern, reusing it for repeated queries."""
+    return re.compile(query, re.IGNORECASE)
+
+
+class _IndicatorValuesSummary:
+    """Accumulates summary statistics and sample rows over batches of streamed indicator values."""
+
+    def __init__(self, max_samples: int) -> None:
+        self.max_samples = max_samples
+        self.total_values = 0
+        self.minimum = float('inf')
+        self.maximum = float('-inf')
+        self.total = 0.0
+        self.count = 0
+        self.rows: List[str] = []
+
+    def add(self, values: List[dict]) -> None:
+        """Folds a batch of values into the statistics and keeps the first max_samples rows."""
+        minimum = self.minimum
+        maximum = self.maximum
+        total = self.total
+        count = self.count
+        append = self.rows.append
+        remaining_samples = self.max_samples - len(self.rows)
+
+        for value in values:
+            x = value.get('value', 'N/A')
+            if x is not None and x != 'N/A':
+                f = float(x)
+                if f < minimum:
+                    minimum = f
+                if f > maximum:
+                    maximum = f
+                total += f
+                count += 1
+
+            if remaining_samples > 0:
+                remaining_samples -= 1
+                # Use the cleaner datetime format from API
+                dt = value.get('datetime', 'Unknown')
+                geo = value.get('geo_name', '')
+                
+                if geo:
+                    append(f"{dt}: {x} ({geo})\n")
+                else:
+                    append(f"{dt}: {x}\n")
+
+        self.minimum = minimum
+        self.maximum = maximum
+        self.total = total
+        self.count = count
+        self.total_values += len(values)
+
+
 class SearchIndicators(BaseModel):
     query: str = Field(..., description="Regex search query to filter indicators by name or description")
 
@@ -23,9 +105,18 @@ class GetIndicatorData(BaseModel):
 class EsiosService:
     BASE_URL = "https://api.esios.ree.es"
     TIMEOUT = 600  # seconds
+    CONNECTION_LIMIT = 20
+    KEEPALIVE_TIMEOUT = 60  # seconds
+    DNS_CACHE_TTL = 300  # seconds
     MAX_SAMPLE_VALUES = 10000
+    STREAM_CHUNK_SIZE = 64 * 1024  # bytes
+    DATA_ROWS_PER_BLOCK = 1000
+    CACHE_TTL = 24 * 60 * 60  # seconds
+    THREAD_SCAN_THRESHOLD = 500  # indicators
+    DATA_CACHE_SIZE = 128  # responses
+    DATA_CACHE_TTL = 5 * 60  # seconds
 
-    def __init__(self, api_token: str) -> None:
+    def __init__(self, api_token: str, cache_path: Optional[Path] = None) -> None:
         """Initializes the connection to the ESIOS API."""
         if not api_token:
             raise ValueError("API token is required to access ESIOS API.")
@@ -34,138 +125,340 @@ class EsiosService:
         self.indicators_cache: Optional[List[dict]] = None
         self.session: Optional[aiohttp.ClientSession] = None
 
+        # Search index over the cached indicators, stored as parallel lists
+        self._ids: List[int] = []
+        self._names: List[str] = []
+        self._short_names: List[str] = []
+        self._descriptions: List[str] = []
+        self._haystack_lower: List[str] = []
+
+        self.cache_path = cache_path if cache_path is not None else _default_cache_path()
+        # Set once indicators_cache and its search index are ready; the lock serialises cold fetches
+        self._cache_ready = asyncio.Event()
+        self._cache_lock = asyncio.Lock()
+        # Validators and catalog from the disk cache, used for conditional refreshes
+        self._etag: Optional[str] = None
+        self._last_modified: Optional[str] = None
+        self._stale_indicators: Optional[List[dict]] = None
+        self._load_disk_cache()
+
+        # Formatted get_indicator_data responses keyed by query, with their expiry time
+        self._data_cache: OrderedDict[tuple, Tuple[Optional[float], Tuple[str, ...]]] = OrderedDict()
+        self._data_inflight: Dict[tuple, asyncio.Task] = {}
+
     async def _ensure_session(self) -> aiohttp.ClientSession:
         """Ensures an aiohttp session is available."""
         if self.session is None or self.session.closed:
-            self.session = aiohttp.ClientSession()
+            connector = aiohttp.TCPConnector(
+                limit=self.CONNECTION_LIMIT,
+                keepalive_timeout=self.KEEPALIVE_TIMEOUT,
+                ttl_dns_cache=self.DNS_CACHE_TTL,
+            )
+            self.session = aiohttp.ClientSession(
+                connector=connector,
+                headers=self.headers,
+                timeout=aiohttp.ClientTimeout(total=self.TIMEOUT),
+            )
         return self.session
 
+    def _load_disk_cache(self) -> None:
+        """Loads the indicators cache from disk, using it directly if it is fresh enough."""
+        try:
+            age = time.time() - self.cache_path.stat().st_mtime
+            payload = orjson.loads(self.cache_path.read_bytes())
+            indicators = payload['indicators']
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable indicators cache {self.cache_path}: {e}")
+            return
+
+        if age > self.CACHE_TTL:
+            # Keep the stale copy around so a 304 response can reuse it
+            self._etag = payload.get('etag')
+            self._last_modified = payload.get('last_modified')
+            self._stale_indicators = indicators
+            return
+
+        self._build_search_index(indicators)
+        self.indicators_cache = indicators
+        self._cache_ready.set()
+        logger.info(f"Loaded {len(indicators)} indicators from {self.cache_path}")
+
+    def _save_disk_cache(self, indicators: List[dict]) -> None:
+        """Atomically writes the indicators cache and its HTTP validators to disk."""
+        payload = {
+            'etag': self._etag,
+            'last_modified': self._last_modified,
+            'indicators': indicators,
+        }
+        tmp_path: Optional[str] = None
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            # Use a unique temp file so concurrent server instances cannot clobber each other's writes
+            with tempfile.NamedTemporaryFile(
+                dir=self.cache_path.parent, prefix=f"{self.cache_path.name}.", suffix=".tmp", delete=False
+            ) as tmp_file:
+                tmp_path = tmp_file.name
+                tmp_file.write(orjson.dumps(payload))
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            logger.warning(f"Failed to write indicators cache {self.cache_path}: {e}")
+            if tmp_path is not None:
+                with contextlib.suppress(OSError):
+                    os.unlink(tmp_path)
+
     async def _fetch_all_indicators(self) -> List[dict]:
         """Fetches all indicators from ESIOS API and caches them."""
-        if self.indicators_cache is None:
+        if self._cache_ready.is_set():
+            return self.indicators_cache
+
+        async with self._cache_lock:
+            if self._cache_ready.is_set():
+                return self.indicators_cache
+
             try:
                 session = await self._ensure_session()
-                timeout = aiohttp.ClientTimeout(total=self.TIMEOUT)
+
+                headers = {}
+                if self._stale_indicators is not None:
+                    if self._etag:
+                        headers['If-None-Match'] = self._etag
+                    if self._last_modified:
+                        headers['If-Modified-Since'] = self._last_modified
                 
                 async with session.get(
                     f"{self.BASE_URL}/indicators", 
-                    headers=self.headers,
-                    timeout=timeout
+                    headers=headers
                 ) as response:
-                    response.raise_for_status()
-                    data = await response.json()
-                    self.indicators_cache = data['indicators']
-                    logger.info(f"Successfully cached {len(self.indicators_cache)} indicators")
+                    if response.status == 304 and self._stale_indicators is not None:
+                        indicators = self._stale_indicators
+                        logger.info(f"Indicators unchanged, reusing {len(indicators)} cached indicators")
+                        # The file on disk is still current; only restart its TTL
+                        with contextlib.suppress(OSError):
+                            os.utime(self.cache_path)
+                    else:
+                        response.raise_for_status()
+                        data = orjson.loads(await response.read())
+                        indicators = data['indicators']
+                        self._etag = response.headers.get('ETag')
+                        self._last_modified = response.headers.get('Last-Modified')
+                        logger.info(f"Successfully cached {len(indicators)} indicators")
+                        self._save_disk_cache(indicators)
+                self._stale_indicators = None
             except aiohttp.ClientError as e:
                 logger.error(f"Network error fetching indicators: {e}")
-                self.indicators_cache = []
+                indicators = self._stale_indicators or []
             except Exception as e:
                 logger.error(f"Failed to fetch indicators: {e}")
-                self.indicators_cache = []
-        
-        return self.indicators_cache
+                indicators = self._stale_indicators or []
+
+            # Build the index before publishing the cache so searches never see it half-ready
+            self._build_search_index(indicators)
+            self.indicators_cache = indicators
+            self._cache_ready.set()
+            return self.indicators_cache
+
+    def _build_search_index(self, indicators: List[dict]) -> None:
+        """Builds the parallel lists scanned by search_indicators."""
+        ids: List[int] = []
+        names: List[str] = []
+        short_names: List[str] = []
+        descriptions: List[str] = []
+        haystack_lower: List[str] = []
+
+        # Read each indicator's fields once and derive every list in the same pass
+        for ind in indicators:
+            name = ind['name']
+            short_name = ind.get('short_name') or ''
+            description = ind.get('description') or ''
+
+            ids.append(ind['id'])
+            names.append(name)
+            short_names.append(short_name)
+            descriptions.append(description)
+            # Joined text for the literal substring path; regexes search each field separately
+            haystack_lower.append(f"{name}\n{short_name}\n{description}".lower())
+
+        self._ids = ids
+        self._names = names
+        self._short_names = short_names
+        self._descriptions = descriptions
+        self._haystack_lower = haystack_lower
+
+    def _scan(self, query: str) -> List[int]:
+        """Returns the indices of the indicators matching the query."""
+        if not _REGEX_METACHARACTERS.search(query):
+            # Plain substring search is much cheaper than running the regex engine
+            query = query.lower()
+            return [idx for idx, hay in enumerate(self._haystack_lower) if query in hay]
+
+        # Search fields one by one so '^', '$' and '\s' keep their per-field meaning
+        search = _compile(query).search
+        return [
+            idx
+            for idx, (name, short_name, description) in enumerate(zip(self._names, self._short_names, self._descriptions))
+            if search(name) or search(short_name) or search(description)
+        ]
 
     async def search_indicators(self, parameters: SearchIndicators) -> str:
         """Searches for indicators matching the query in their name or description."""
         try:
-            indicators = await self._fetch_all_indicators()
+            await self._fetch_all_indicators()
             
             try:
-                pattern = re.compile(parameters.query, re.IGNORECASE)
+                if len(self._ids) > self.THREAD_SCAN_THRESHOLD:
+                    # Keep the event loop free to serve other MCP messages during large scans
+                    matching_indicators = await asyncio.to_thread(self._scan, parameters.query)
+                else:
+                    matching_indicators = self._scan(parameters.query)
             except re.error:
                 return f"Invalid regex pattern: '{parameters.query}'"
 
-            matching_indicators = []
-            for ind in indicators:
-                if (pattern.search(ind['name']) or 
-                    pattern.search(ind['short_name']) or
-                    pattern.search(ind.get('description', ''))):
-                    matching_indicators.append(ind)
-
             if not matching_indicators:
                 return "No indicators found matching your query."
 
-            result = f"Found {len(matching_indicators)} matching indicators:\n\n"
+            parts: List[str] = [f"Found {len(matching_indicators)} matching indicators:\n\n"]
             
             # For better LLM processing, use consistent formatting
-            for ind in matching_indicators:
-                result += f"ID: {ind['id']}\n"
-                result += f"Name: {ind['name']}\n"
-                if ind.get('short_name'):
-                    result += f"Short name: {ind['short_name']}\n"
+            for idx in matching_indicators:
+                parts.append(f"ID: {self._ids[idx]}\n")
+                parts.append(f"Name: {self._names[idx]}\n")
+                if self._short_names[idx]:
+                    parts.append(f"Short name: {self._short_names[idx]}\n")
                 
                 # Include description - it's crucial for LLMs to understand what the indicator represents
-                if ind.get('description'):
-                    result += f"Description: {ind['description']}\n"
+                if self._descriptions[idx]:
+                    parts.append(f"Description: {self._descriptions[idx]}\n")
                 
-                result += "\n"
+                parts.append("\n")
 
             if len(matching_indicators) > 100:
-                result += "Note: Large result set returned. Consider refining your search query for more targeted results.\n"
+                parts.append("Note: Large result set returned. Consider refining your search query for more targeted results.\n")
                 
-            result += "Use the indicator ID with get_indicator_data to retrieve actual time series data."
+            parts.append("Use the indicator ID with get_indicator_data to retrieve actual time series data.")
             
-            return result
+            return "".join(parts)
         except Exception as e:
             logger.error(f"Failed to search indicators: {e}")
             return f"Failed to search indicators: {e}"
 
     async def get_indicator_data(self, parameters: GetIndicatorData) -> str:
         """Retrieves data for a specific indicator within the given date range."""
+        return "".join(await self.get_indicator_data_blocks(parameters))
+
+    async def get_indicator_data_blocks(self, parameters: GetIndicatorData) -> List[str]:
+        """Retrieves indicator data as a header block followed by blocks of at most DATA_ROWS_PER_BLOCK rows."""
         try:
-            start_date_str = parameters.start_date.strftime("%Y-%m-%dT%H:%M:%SZ")
-            end_date_str = parameters.end_date.strftime("%Y-%m-%dT%H:%M:%SZ")
-
-            endpoint = (
-                f"{self.BASE_URL}/indicators/{parameters.indicator_id}"
-                f"?start_date={start_date_str}&end_date={end_date_str}"
-                f"&time_trunc={parameters.time_trunc}"
-                f"&time_agg={parameters.time_agg}"
-            )
+            start_date_str = _format_datetime(parameters.start_date)
+            end_date_str = _format_datetime(parameters.end_date)
+            key = (parameters.indicator_id, start_date_str, end_date_str, parameters.time_trunc, parameters.time_agg)
 
-            session = await self._ensure_session()
-            timeout = aiohttp.ClientTimeout(total=self.TIMEOUT)
-            
-            async with session.get(endpoint, headers=self.headers, timeout=timeout) as response:
-                response.raise_for_status()
-                indicator_data = await response.json()
+            cached = self._data_cache.get(key)
+            if cached is not None:
+                expires_at, result = cached
+                if expires_at is None or expires_at > time.monotonic():
+                    self._data_cache.move_to_end(key)
+                    return list(result)
+                del self._data_cache[key]
 
-            indicator_info = indicator_data['indicator']
-            values = indicator_info['values']
-            
-            # Build clean, structured text output
-            result = f"Indicator: {indicator_info['name']} (ID: {parameters.indicator_id})\n"
-            result += f"Data points: {len(values)}\n"
-            result += f"Period: {start_date_str} to {end_date_str}\n"
-            result += f"Aggregation: {parameters.time_agg} per {parameters.time_trunc}\n\n"
-            
-            # Add summary statistics
-            if values:
-                numeric_values = [float(v['value']) for v in values if v['value'] is not None]
-                if numeric_values:
-                    result += f"Summary: min={min(numeric_values):.2f}, max={max(numeric_values):.2f}, avg={sum(numeric_values)/len(numeric_values):.2f}\n\n"
-            
-            # Show sample data points
-            result += "Data:\n"
-            sample_values = values[:self.MAX_SAMPLE_VALUES]
-            for value in sample_values:
-                # Use the cleaner datetime format from API
-                dt = value.get('datetime', 'Unknown')
-                val = value.get('value', 'N/A')
-                geo = value.get('geo_name', '')
-                
-                result += f"{dt}: {val}"
-                if geo:
-                    result += f" ({geo})"
-                result += "\n"
-            
-            if len(values) > self.MAX_SAMPLE_VALUES:
-                result += f"\n... and {len(values) - self.MAX_SAMPLE_VALUES} more data points"
-                
-            return result
+            # Share a single request between concurrent callers asking for the same data
+            task = self._data_inflight.get(key)
+            if task is None:
+                task = asyncio.ensure_future(self._request_indicator_data(parameters, start_date_str, end_date_str))
+                self._data_inflight[key] = task
+                task.add_done_callback(functools.partial(self._finish_indicator_request, key, parameters.end_date))
+            return list(await asyncio.shield(task))
         except Exception as e:
             logger.error(f"Failed to get indicator data: {e}")
-            return f"Failed to get indicator data: {e}"
+            return [f"Failed to get indicator data: {e}"]
+
+    def _finish_indicator_request(self, key: tuple, end_date: datetime, task: asyncio.Task) -> None:
+        """Caches the result of a shared request, even if every caller has since been cancelled."""
+        self._data_inflight.pop(key, None)
+        if task.cancelled():
+            return
+        # Retrieving the exception here keeps failures that no caller awaited from being reported as unhandled
+        if task.exception() is None:
+            self._store_indicator_data(key, end_date, task.result())
+
+    def _store_indicator_data(self, key: tuple, end_date: datetime, result: Tuple[str, ...]) -> None:
+        """Caches a formatted indicator data response, evicting the least recently used entry."""
+        if end_date.tzinfo is None:
+            end_date = end_date.replace(tzinfo=timezone.utc)
+        if end_date < datetime.now(timezone.utc) - timedelta(days=1):
+            # Data for windows that ended more than a day ago no longer changes
+            expires_at = None
+        else:
+            expires_at = time.monotonic() + self.DATA_CACHE_TTL
+
+        self._data_cache[key] = (expires_at, result)
+        self._data_cache.move_to_end(key)
+        while len(self._data_cache) > self.DATA_CACHE_SIZE:
+            self._data_cache.popitem(last=False)
+
+    async def _request_indicator_data(self, parameters: GetIndicatorData, start_date_str: str, end_date_str: str) -> Tuple[str, ...]:
+        """Requests indicator data from ESIOS API and formats it as text blocks."""
+        params = {
+            "start_date": start_date_str,
+            "end_date": end_date_str,
+            "time_trunc": parameters.time_trunc,
+            "time_agg": parameters.time_agg,
+        }
+
+        session = await self._ensure_session()
+        
+        async with session.get(f"{self.BASE_URL}/indicators/{parameters.indicator_id}", params=params) as response:
+            response.raise_for_status()
+
+            # Stream-parse the payload so memory stays bounded by the sample size, not the response size
+            names = ijson.sendable_list()
+            values = ijson.sendable_list()
+            name_parser = ijson.items_coro(names, 'indicator.name')
+            values_parser = ijson.items_coro(values, 'indicator.values.item', use_float=True)
+            summary = _IndicatorValuesSummary(self.MAX_SAMPLE_VALUES)
+
+            async for chunk in response.content.iter_chunked(self.STREAM_CHUNK_SIZE):
+                # ESIOS sends the name before the values, so the name parser is
+                # only fed until it finds it; otherwise it reads the whole payload
+                if name_parser is not None:
+                    name_parser.send(chunk)
+                    if names:
+                        name_parser = None
+                values_parser.send(chunk)
+                summary.add(values)
+                del values[:]
+            if name_parser is not None:
+                name_parser.close()
+            values_parser.close()
+            summary.add(values)
+
+        if not names:
+            raise ValueError("ESIOS response has no indicator name")
+        
+        # Build clean, structured text output
+        parts: List[str] = [
+            f"Indicator: {names[0]} (ID: {parameters.indicator_id})\n",
+            f"Data points: {summary.total_values}\n",
+            f"Period: {start_date_str} to {end_date_str}\n",
+            f"Aggregation: {parameters.time_agg} per {parameters.time_trunc}\n\n",
+        ]
+        
+        if summary.count:
+            parts.append(f"Summary: min={summary.minimum:.2f}, max={summary.maximum:.2f}, avg={summary.total/summary.count:.2f}\n\n")
+
+        parts.append("Data:\n")
+        blocks = ["".join(parts)]
+
+        rows = summary.rows
+        rows_per_block = self.DATA_ROWS_PER_BLOCK
+        for start in range(0, len(rows), rows_per_block):
+            blocks.append("".join(rows[start:start + rows_per_block]))
+        
+        if summary.total_values > self.MAX_SAMPLE_VALUES:
+            blocks[-1] += f"\n... and {summary.total_values - self.MAX_SAMPLE_VALUES} more data points"
+            
+        return tuple(blocks)
 
     async def close(self) -> None:
         """Close the session when done."""